@@ -462,7 +462,9 @@ class Module:
         return f"{concatenate_as_string(self.includes, delimiter)}\n{concatenate_as_string(self.members, delimiter)}\n"
 
     def __add__(self, other):
-        return Module(includes=list(set(self.includes + other.includes)), members=self.members + other.members)
+        return Module(
+            includes=list(dict.fromkeys(self.includes + other.includes)), members=self.members + other.members
+        )
 
     def __iadd__(self, other):
         return self + other
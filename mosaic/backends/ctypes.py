@@ -1,4 +1,5 @@
-from ctypes import POINTER, c_float, c_double, c_int64
+import functools
+from ctypes import POINTER, c_float, c_double, c_int64, c_uint64, cdll
 
 import numpy as np
 
@@ -8,6 +9,7 @@ def get_ctype_from_numpy_dtype(dtype):
         np.dtype(np.float32): c_float,
         np.dtype(np.float64): c_double,
         np.dtype(np.int64): c_int64,
+        np.dtype(np.uint64): c_uint64,
     }[dtype]
 
 
@@ -16,6 +18,7 @@ def get_ctype_string_from_numpy_dtype(dtype):
         np.dtype(np.float32): "float",
         np.dtype(np.float64): "double",
         np.dtype(np.int64): "int64_t",
+        np.dtype(np.uint64): "uint64_t",
     }[dtype]
 
 
@@ -23,3 +26,8 @@ def cast_numpy_array_to_pointer(array: np.array):
     c_type = get_ctype_from_numpy_dtype(array.dtype)
     pointer_type = POINTER(c_type)
     return array.ctypes.data_as(pointer_type)
+
+
+@functools.cache
+def load_shared_library(shared_library_file: str):
+    return cdll.LoadLibrary(shared_library_file)
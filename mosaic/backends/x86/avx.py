@@ -13,3 +13,17 @@ def _mm256_fmadd_ps(*args):
         c.Identifier("_mm256_fmadd_ps"),
         *args,
     )
+
+
+def _mm512_load_ps(*args):
+    return c.invoke(
+        c.Identifier("_mm512_load_ps"),
+        *args,
+    )
+
+
+def _mm512_fmadd_ps(*args):
+    return c.invoke(
+        c.Identifier("_mm512_fmadd_ps"),
+        *args,
+    )
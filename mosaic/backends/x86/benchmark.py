@@ -0,0 +1,70 @@
+from toolz import first
+
+import codegen as c
+
+elapsed_nanoseconds = c.Lambda(
+    """ \
+auto elapsed_nanoseconds = [](const auto& start, const auto& end) {
+    return std::chrono::duration_cast<std::chrono::nanoseconds>(end - start).count();
+};
+"""
+)
+
+
+def generate_module(kernel_name, kernel_module):
+    benchmark_name = f"{kernel_name}_benchmark"
+
+    kernel_function = first(
+        member
+        for member in kernel_module.members
+        if isinstance(member, c.Function) and member.name == c.Identifier(kernel_name)
+    )
+    kernel_arguments = kernel_function.arguments
+
+    num_iterations = c.variable(c.Type("uint64_t"), "num_iterations")
+    num_runs_per_iteration = c.variable(c.Type("uint64_t"), "num_runs_per_iteration")
+    execution_times = c.variable(c.Type("uint64_t").pointer().restrict(), "execution_times")
+
+    iteration = c.variable(c.Type("uint64_t"), "iteration")
+    run = c.variable(c.Type("uint64_t"), "run")
+    start = c.variable(c.AUTO, "start")
+    end = c.variable(c.AUTO, "end")
+
+    run_loop = c.ForLoop(
+        c.Declare(run, c.literal(0)),
+        run < num_runs_per_iteration,
+        c.add_in_place(run, c.literal(1)),
+        c.block(
+            c.Statement(c.invoke(c.Identifier(kernel_name), *kernel_arguments)),
+            # Keep the compiler from merging or dropping repeated runs
+            c.Statement(c.Text('asm volatile("" : : : "memory")')),
+        ),
+    )
+
+    iteration_loop = c.ForLoop(
+        c.Declare(iteration, c.literal(0)),
+        iteration < num_iterations,
+        c.add_in_place(iteration, c.literal(1)),
+        c.block(
+            start << c.invoke(c.Identifier("std::chrono::steady_clock::now")),
+            run_loop,
+            end << c.invoke(c.Identifier("std::chrono::steady_clock::now")),
+            c.assign(execution_times[iteration], c.invoke(c.Identifier("elapsed_nanoseconds"), start, end)),
+        ),
+    )
+
+    module = c.Module(
+        includes=[c.Include("chrono"), c.Include("stdint.h")],
+        members=[
+            c.Function(
+                return_type=c.Type("void"),
+                name=c.Identifier(benchmark_name),
+                arguments=[*kernel_arguments, num_iterations, num_runs_per_iteration, execution_times],
+                body=c.block(elapsed_nanoseconds, iteration_loop),
+            ).extern_c()
+        ],
+    )
+    return benchmark_name, module
+
+
+__all__ = ["generate_module"]
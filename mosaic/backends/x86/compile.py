@@ -1,8 +1,14 @@
+import functools
+import glob
+import hashlib
+import os
 import pathlib
+import pickle
 import subprocess
 from typing import Collection
 from pathlib import Path
 
+from filelock import FileLock
 from loguru import logger
 
 FLAGS = [
@@ -10,11 +16,10 @@ FLAGS = [
     "-O3",
     "-g",
     "-march=native",
+    # Keep frame pointers so that Tracy and perf can walk the stacks of the kernels
     "-fno-omit-frame-pointer",
     "-fno-exceptions",
-    "-mavx2",
-    "-msse4",
-    "-mfma",
+    "-fno-plt",
     "-maes",
     # "-shared",
     "-fPIC",
@@ -26,65 +31,130 @@ FLAGS = [
 ]
 
 
-def compile_source_file_to_assembly(source_file: Path, include_paths: Collection[Path], output_object_file: Path):
-    output_object_file.unlink(missing_ok=True)
-    output_object_file = str(output_object_file)
+@functools.cache
+def get_cpu_flags() -> frozenset[str]:
+    try:
+        cpu_info = Path("/proc/cpuinfo").read_text()
+    except OSError:
+        return frozenset()
 
-    source_file = str(source_file)
-    include_paths = [str(include_path) for include_path in include_paths]
+    for line in cpu_info.splitlines():
+        if line.startswith("flags"):
+            _, flags = line.split(":", 1)
+            return frozenset(flags.split())
+    return frozenset()
 
-    command = ["g++", "-c", source_file, *include_paths, *FLAGS, "-S", "-fverbose-asm", "-o", output_object_file]
-    logger.info(f"Compile Source Code to Assembly: \"{' '.join(command)}\"")
-    result = subprocess.run(command)
-    assert result.returncode == 0
+
+if "avx512f" in get_cpu_flags():
+    FLAGS.append("-mprefer-vector-width=512")
+
+
+@functools.cache
+def get_compiler_version() -> bytes:
+    return subprocess.check_output(["g++", "--version"])
 
 
-def compile_source_file_to_object_file(source_file: Path, include_paths: Collection[Path], output_object_file: Path):
-    output_object_file.unlink(missing_ok=True)
-    output_object_file = str(output_object_file)
+@functools.cache
+def get_compiler_target(flags: tuple[str, ...]) -> bytes:
+    # Resolve -march=native to the ISA of this host, because the cache directory might be shared with other hosts
+    return subprocess.check_output(["g++", *flags, "-Q", "--help=target"], stderr=subprocess.DEVNULL)
 
-    source_file = str(source_file)
-    include_paths = [str(include_path) for include_path in include_paths]
 
-    command = ["g++", "-c", source_file, *include_paths, *FLAGS, "-o", output_object_file]
-    logger.info(f"Compile Source Code to Object File: \"{' '.join(command)}\"")
-    result = subprocess.run(command)
-    assert result.returncode == 0
+def compile_source_file_to_assembly(
+    source_file: Path, include_paths: Collection[str], flags: Collection[str], output_assembly_file: Path
+):
+    command = [
+        "g++",
+        "-c",
+        str(source_file),
+        *include_paths,
+        *flags,
+        "-S",
+        "-fverbose-asm",
+        "-o",
+        str(output_assembly_file),
+    ]
+    logger.info(f"Compile Source Code to Assembly: \"{' '.join(command)}\"")
+    subprocess.run(command, check=True)
+
+
+def compute_shared_library_path(source_files: Collection[Path], include_paths: Collection[str], flags: Collection[str]):
+    kernel_source_file, *_ = source_files
+    source_bytes = tuple(source_file.read_bytes() for source_file in source_files)
+    # Use a cryptographic digest because a collision would silently load the wrong kernel.
+    # g++ is only asked for its version and target once per process, a cache hit otherwise never starts it
+    key = hashlib.sha256(
+        pickle.dumps(
+            (
+                source_bytes,
+                tuple(include_paths),
+                tuple(flags),
+                get_compiler_version(),
+                get_compiler_target(tuple(flags)),
+            )
+        )
+    ).hexdigest()[:16]
+    return kernel_source_file.parent / f"{kernel_source_file.stem}.{key}.so"
+
 
+def remove_stale_shared_libraries(shared_library: Path):
+    # Libraries built from an earlier version of the same source are never loaded again
+    stem, _ = shared_library.name.split(".", 1)
+    for stale_shared_library in shared_library.parent.glob(f"{glob.escape(stem)}.*.so"):
+        if stale_shared_library != shared_library:
+            stale_shared_library.unlink(missing_ok=True)
+    # Earlier versions of this module locked every library separately
+    for stale_lock_file in shared_library.parent.glob(f"{glob.escape(stem)}.*.so.lock"):
+        stale_lock_file.unlink(missing_ok=True)
 
-def compile_shared_library(kernel_source_file: pathlib.Path, enable_tracy=False):
+
+def compile_shared_library(kernel_source_file: pathlib.Path, enable_tracy=False, emit_assembly=False):
     output_path = kernel_source_file.parent
     include_paths = [
         "-I",
         str(output_path),
     ]
-    kernel_object_file = kernel_source_file.with_suffix(".o")
-    object_files = [kernel_object_file]
+    source_files = [kernel_source_file]
+    flags = list(FLAGS)
 
     if enable_tracy:
-        FLAGS.append("-DTRACY_ENABLE")
-        tracy_object_file = output_path / "tracy.o"
+        flags.append("-DTRACY_ENABLE")
 
         tracy_include_path = ["-I", "vendor/tracy/public"]
         include_paths.extend(tracy_include_path)
-
-        compile_source_file_to_object_file(
-            Path("vendor/tracy/public/TracyClient.cpp"), tracy_include_path, tracy_object_file
-        )
-        object_files.append(tracy_object_file)
-
-    compile_source_file_to_object_file(kernel_source_file, include_paths, kernel_object_file)
-
-    object_files = [str(object_file) for object_file in object_files]
-    shared_library = kernel_source_file.with_suffix(".so")
-    shared_library.unlink(missing_ok=True)
-    shared_library = str(shared_library)
-    command = ["g++", "-fPIC", "-shared", "-rdynamic", *object_files, "-o", shared_library]
-    logger.info(f"Compile Object Files to Shared Library: \"{' '.join(command)}\"")
-    result = subprocess.run(command)
-    assert result.returncode == 0
-
-    kernel_assembly_file = kernel_source_file.with_suffix(".s")
-    compile_source_file_to_assembly(kernel_source_file, include_paths, kernel_assembly_file)
-
-    return shared_library
+        source_files.append(Path("vendor/tracy/public/TracyClient.cpp"))
+
+    if emit_assembly:
+        kernel_assembly_file = kernel_source_file.with_suffix(".s")
+        compile_source_file_to_assembly(kernel_source_file, include_paths, flags, kernel_assembly_file)
+
+    shared_library = compute_shared_library_path(source_files, include_paths, flags)
+    # Concurrent test runs write to the same output directories, so only one of them may build a library at a time.
+    # The lock is shared by all versions of a source file, so that stale libraries can be removed while holding it
+    with FileLock(kernel_source_file.with_suffix(".so.lock")):
+        if shared_library.exists():
+            logger.info(f'Reuse Cached Shared Library: "{shared_library}"')
+            return str(shared_library)
+
+        # Link to a temporary file first, so that an interrupted build never leaves a truncated library behind
+        temporary_shared_library = shared_library.with_name(f"{shared_library.name}.{os.getpid()}.tmp")
+        source_files = [str(source_file) for source_file in source_files]
+        command = [
+            "g++",
+            *source_files,
+            *include_paths,
+            *flags,
+            "-shared",
+            "-rdynamic",
+            "-o",
+            str(temporary_shared_library),
+        ]
+        logger.info(f"Compile Source Code to Shared Library: \"{' '.join(command)}\"")
+        try:
+            subprocess.run(command, check=True)
+            os.replace(temporary_shared_library, shared_library)
+            remove_stale_shared_libraries(shared_library)
+        finally:
+            temporary_shared_library.unlink(missing_ok=True)
+
+    return str(shared_library)
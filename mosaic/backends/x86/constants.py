@@ -1,2 +1,11 @@
+import enum
+
 AVX_SIZE = 8
-MEMORY_ALIGNMENT = 32
+AVX512_SIZE = 16
+MEMORY_ALIGNMENT = 64
+
+
+class VectorISA(enum.Enum):
+    NONE = enum.auto()
+    AVX2 = enum.auto()
+    AVX512 = enum.auto()
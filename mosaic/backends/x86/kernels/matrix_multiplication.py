@@ -5,8 +5,8 @@ import codegen as c
 from mosaic.tilelab.layout import TransposedLayout
 
 from mosaic.tilelab.tile import TileConfig
-from mosaic.backends.x86.avx import _mm256_load_ps, _mm256_fmadd_ps
-from mosaic.backends.x86.constants import AVX_SIZE, MEMORY_ALIGNMENT
+from mosaic.backends.x86.avx import _mm256_load_ps, _mm256_fmadd_ps, _mm512_load_ps, _mm512_fmadd_ps
+from mosaic.backends.x86.constants import AVX_SIZE, AVX512_SIZE, MEMORY_ALIGNMENT, VectorISA
 from mosaic.backends.x86.kernel_name import create_kernel_name
 
 OffsetType = c.Variable | c.Expression
@@ -14,6 +14,7 @@ OffsetType = c.Variable | c.Expression
 InputType = c.Type("float").const().pointer().restrict().aligned(MEMORY_ALIGNMENT)
 OutputType = c.Type("float").pointer().restrict().aligned(MEMORY_ALIGNMENT)
 Vector256Type = c.Type("__m256")
+Vector512Type = c.Type("__m512")
 
 
 mm256_reduce_add_ps = c.Lambda(
@@ -38,27 +39,32 @@ def generate_module(
     input_dtypes,
     output_dtype,
     *,
-    use_avx_manually: bool,
+    vector_isa: VectorISA,
     enable_tracy: bool = False,
 ):
     kernel_name = create_kernel_name(
         pathlib.Path(__file__).stem,
         input_tile_configs[0],
         input_tile_configs[1],
-        use_avx_manually,
+        vector_isa.name,
     )
 
     input_a_var = c.variable(InputType, "input_a_var")
     input_b_var = c.variable(InputType, "input_b_var")
     output_var = c.variable(OutputType, "output_var")
 
-    body = initialize_output(output_tile_config, output_var)
+    body = c.block(
+        assume_aligned(input_a_var, "const float*"),
+        assume_aligned(input_b_var, "const float*"),
+        assume_aligned(output_var, "float*"),
+    )
+    body += initialize_output(output_tile_config, output_var)
     body += generate_body(
         arguments=[input_a_var, input_b_var, output_var],
         input_a_tile_config=input_tile_configs[0],
         input_b_tile_config=input_tile_configs[1],
         offsets=dict(input_a_var=c.literal(0), input_b_var=c.literal(0), output_var=c.literal(0)),
-        use_avx_manually=use_avx_manually,
+        vector_isa=vector_isa,
         enable_tracy=enable_tracy,
     )
 
@@ -83,6 +89,16 @@ def generate_module(
     return kernel_name, module
 
 
+def assume_aligned(variable, pointer_type):
+    return c.assign(
+        variable,
+        c.invoke(
+            c.Identifier(f"static_cast<{pointer_type}>"),
+            c.invoke(c.Identifier("__builtin_assume_aligned"), variable, c.literal(MEMORY_ALIGNMENT)),
+        ),
+    )
+
+
 def initialize_output(output_tile_config, output_var):
     index = c.variable(c.Type("uint32_t"), "index")
     num_iterations = math.prod(output_tile_config.shape)
@@ -98,6 +114,27 @@ def initialize_output(output_tile_config, output_var):
     return c.block(loop)
 
 
+def get_vector_size(vector_isa: VectorISA):
+    if vector_isa == VectorISA.AVX512:
+        return AVX512_SIZE
+    elif vector_isa == VectorISA.AVX2:
+        return AVX_SIZE
+    return 1
+
+
+def supports_vector_isa(vector_isa: VectorISA, input_a_tile_config, input_b_tile_config):
+    if vector_isa == VectorISA.NONE:
+        return True
+
+    while isinstance(input_a_tile_config, TileConfig):
+        input_a_tile_config = input_a_tile_config.next_level_tile_config
+    while isinstance(input_b_tile_config, TileConfig):
+        input_b_tile_config = input_b_tile_config.next_level_tile_config
+
+    *_, k_size = input_a_tile_config.shape
+    return input_b_is_transposed(input_b_tile_config) and k_size % get_vector_size(vector_isa) == 0
+
+
 def input_b_is_transposed(tile_config):
     if not isinstance(tile_config.layout, TransposedLayout):
         return False
@@ -115,7 +152,7 @@ def generate_body(
     input_a_tile_config,
     input_b_tile_config,
     offsets,
-    use_avx_manually: bool,
+    vector_isa: VectorISA,
     enable_tracy: bool = False,
 ):
     input_a_var, input_b_var, output_var = arguments
@@ -186,7 +223,7 @@ def generate_body(
             input_a_tile_config=input_a_tile_config.next_level_tile_config,
             input_b_tile_config=input_b_tile_config.next_level_tile_config,
             offsets=dict(input_a_var=next_a_offset, input_b_var=next_b_offset, output_var=next_output_offset),
-            use_avx_manually=use_avx_manually,
+            vector_isa=vector_isa,
         )
 
     else:
@@ -196,20 +233,40 @@ def generate_body(
             outer_loop_index = n
             outer_loop_size = c.literal(n_size)
 
-            if use_avx_manually:
-                inner_loop_increment = c.literal(AVX_SIZE)
-
-                input_a_vector = c.variable(Vector256Type, "input_a_vector")
-                input_b_vector = c.variable(Vector256Type, "input_b_vector")
-                output_vector = c.variable(Vector256Type, "output_vector")
+            vector_size = get_vector_size(vector_isa)
+            if vector_isa == VectorISA.AVX512:
+                vector_type = Vector512Type
+                load_ps = _mm512_load_ps
+                fmadd_ps = _mm512_fmadd_ps
+                setzero_ps = c.Identifier("_mm512_setzero_ps")
+                # GCC and Clang provide the horizontal sum for 512-bit vectors in immintrin.h
+                reduce_add_ps_definitions = []
+                reduce_add_ps = c.Identifier("_mm512_reduce_add_ps")
+            elif vector_isa == VectorISA.AVX2:
+                vector_type = Vector256Type
+                load_ps = _mm256_load_ps
+                fmadd_ps = _mm256_fmadd_ps
+                setzero_ps = c.Identifier("_mm256_setzero_ps")
+                reduce_add_ps_definitions = [mm256_reduce_add_ps]
+                reduce_add_ps = c.Identifier("_mm256_reduce_add_ps")
+
+            if vector_isa != VectorISA.NONE:
+                # Rows of a and columns of b are contiguous along k, so full vectors are loaded from aligned addresses
+                if k_size % vector_size != 0:
+                    raise RuntimeError(f"{vector_isa.name} requires k to be a multiple of {vector_size}: {k_size}")
+                inner_loop_increment = c.literal(vector_size)
+
+                input_a_vector = c.variable(vector_type, "input_a_vector")
+                input_b_vector = c.variable(vector_type, "input_b_vector")
+                output_vector = c.variable(vector_type, "output_vector")
 
                 outer_loop_body_before = c.block(
-                    output_vector << c.invoke(c.Identifier("_mm256_setzero_ps")),
+                    output_vector << c.invoke(setzero_ps),
                 )
 
                 inner_loop_body = c.block(
                     input_a_vector
-                    << _mm256_load_ps(
+                    << load_ps(
                         input_a_var
                         + offsets["input_a_var"]
                         + b * c.literal(m_size) * c.literal(k_size)
@@ -217,7 +274,7 @@ def generate_body(
                         + k
                     ),
                     input_b_vector
-                    << _mm256_load_ps(
+                    << load_ps(
                         input_b_var
                         + offsets["input_b_var"]
                         + b * c.literal(n_size) * c.literal(k_size)
@@ -226,7 +283,7 @@ def generate_body(
                     ),
                     c.assign(
                         output_vector,
-                        _mm256_fmadd_ps(
+                        fmadd_ps(
                             input_a_vector,
                             input_b_vector,
                             output_vector,
@@ -235,7 +292,7 @@ def generate_body(
                 )
 
                 outer_loop_body_after = c.block(
-                    mm256_reduce_add_ps,
+                    *reduce_add_ps_definitions,
                     c.Statement(
                         c.add_in_place(
                             output_var[
@@ -244,7 +301,7 @@ def generate_body(
                                 + m * c.literal(n_size)
                                 + n
                             ],
-                            c.invoke(c.Identifier("_mm256_reduce_add_ps"), output_vector),
+                            c.invoke(reduce_add_ps, output_vector),
                         )
                     ),
                 )
@@ -276,6 +333,10 @@ def generate_body(
                 outer_loop_body_before = c.block(declare_output_index)
 
         else:
+            # Only the dot products of the transposed layout are vectorized manually
+            if vector_isa != VectorISA.NONE:
+                raise RuntimeError(f"{vector_isa.name} is only supported when the innermost level of b is transposed")
+
             inner_loop_index = n
             inner_loop_size = c.literal(n_size)
             outer_loop_index = k
@@ -9,6 +9,7 @@ from composit.introspection import class_name
 from composit.multidigraph import topological_traversal
 from composit.numpy.core import Constant, get_operands
 
+from mosaic.backends.x86.constants import MEMORY_ALIGNMENT
 from mosaic.backends.x86.types import (
     BufferDescriptor,
     ConstantBufferDescriptor,
@@ -199,7 +200,7 @@ def allocate_buffers(graph):
     buffer_descriptor_to_size = size_buffers(graph)
     buffer_descriptor_to_buffer = {}
     for buffer_descriptor, (size, dtype) in buffer_descriptor_to_size.items():
-        array = create_aligned_array((size,), dtype=dtype)
+        array = create_aligned_array((size,), dtype=dtype, align=MEMORY_ALIGNMENT)
         array[:] = 0
         buffer_descriptor_to_buffer[buffer_descriptor] = Buffer(array=array)
     buffer_descriptor_to_buffer = pmap(buffer_descriptor_to_buffer)
@@ -216,7 +217,7 @@ def populate_constant_buffers(graph, buffer_descriptor_to_buffer):
         tile_config = first(attributes["tile_configs"])
         buffer_descriptor = first(attributes["buffer_descriptors"])
         buffer = buffer_descriptor_to_buffer[buffer_descriptor]
-        buffer.array[:] = to_tilized_array(buffer_descriptor.array, tile_config)
+        to_tilized_array(buffer_descriptor.array, tile_config, out=buffer.array)
     return buffer_descriptor_to_buffer
 
 
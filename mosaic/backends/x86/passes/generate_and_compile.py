@@ -8,7 +8,7 @@ from composit.introspection import class_name
 from composit.multidigraph import topological_traversal
 from composit.numpy.core import get_operands
 from mosaic.backends.x86.compile import compile_shared_library
-from mosaic.backends.x86.constants import MEMORY_ALIGNMENT
+from mosaic.backends.x86.constants import MEMORY_ALIGNMENT, VectorISA
 from mosaic.backends.x86.kernels import (
     matrix_multiplication,
     unary_operation,
@@ -43,12 +43,15 @@ def get_kernel_name_and_module(instruction, input_tile_configs, output_tile_conf
             output_dtype,
         )
     elif instruction_class_name == "matmul":
+        vector_isa = VectorISA.AVX2
+        if not matrix_multiplication.supports_vector_isa(vector_isa, *input_tile_configs):
+            vector_isa = VectorISA.NONE
         kernel_name, kernel_module = matrix_multiplication.generate_module(
             input_tile_configs,
             output_tile_config,
             input_dtypes,
             output_dtype,
-            use_avx_manually=True,
+            vector_isa=vector_isa,
         )
     elif instruction_class_name in {"exp", "sqrt", "gelu"}:
         kernel_name, kernel_module = unary_operation.generate_module(
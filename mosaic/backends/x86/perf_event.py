@@ -0,0 +1,100 @@
+import contextlib
+import ctypes
+import fcntl
+import os
+import platform
+
+from loguru import logger
+
+# Constants from linux/perf_event.h
+PERF_TYPE_HARDWARE = 0
+PERF_TYPE_SOFTWARE = 1
+PERF_COUNT_HW_CPU_CYCLES = 0
+PERF_COUNT_HW_INSTRUCTIONS = 1
+PERF_COUNT_SW_TASK_CLOCK = 1
+
+PERF_EVENT_IOC_ENABLE = 0x2400
+PERF_EVENT_IOC_DISABLE = 0x2401
+PERF_EVENT_IOC_RESET = 0x2403
+
+DISABLED = 1 << 0
+EXCLUDE_KERNEL = 1 << 5
+EXCLUDE_HV = 1 << 6
+
+SYSCALL_NUMBERS = {"x86_64": 298}
+
+libc = ctypes.CDLL(None, use_errno=True)
+
+HARDWARE_EVENTS = (
+    (PERF_TYPE_HARDWARE, PERF_COUNT_HW_CPU_CYCLES),
+    (PERF_TYPE_HARDWARE, PERF_COUNT_HW_INSTRUCTIONS),
+)
+
+
+class PerfEventAttr(ctypes.Structure):
+    _fields_ = [
+        ("type", ctypes.c_uint32),
+        ("size", ctypes.c_uint32),
+        ("config", ctypes.c_uint64),
+        ("sample_period", ctypes.c_uint64),
+        ("sample_type", ctypes.c_uint64),
+        ("read_format", ctypes.c_uint64),
+        ("flags", ctypes.c_uint64),
+        ("wakeup_events", ctypes.c_uint32),
+        ("bp_type", ctypes.c_uint32),
+        ("config1", ctypes.c_uint64),
+    ]
+
+
+def open_counter(event_type, config, group_fd=-1):
+    syscall_number = SYSCALL_NUMBERS.get(platform.machine())
+    if syscall_number is None:
+        raise OSError(f"perf_event_open is not supported on {platform.machine()}")
+
+    attr = PerfEventAttr(
+        type=event_type,
+        size=ctypes.sizeof(PerfEventAttr),
+        config=config,
+        # Only the group leader starts disabled, the other counters follow it
+        flags=(DISABLED if group_fd == -1 else 0) | EXCLUDE_KERNEL | EXCLUDE_HV,
+    )
+    fd = libc.syscall(syscall_number, ctypes.byref(attr), 0, -1, group_fd, 0)
+    if fd < 0:
+        errno = ctypes.get_errno()
+        raise OSError(errno, f"perf_event_open failed: {os.strerror(errno)}")
+    return fd
+
+
+def read_counter(fd):
+    return int.from_bytes(os.read(fd, 8), byteorder="little")
+
+
+@contextlib.contextmanager
+def count_events(events=HARDWARE_EVENTS):
+    counts = [0] * len(events)
+    fds = []
+    try:
+        for event_type, config in events:
+            fds.append(open_counter(event_type, config, group_fd=fds[0] if fds else -1))
+
+        leader, *_ = fds
+        fcntl.ioctl(leader, PERF_EVENT_IOC_RESET, 0)
+        fcntl.ioctl(leader, PERF_EVENT_IOC_ENABLE, 0)
+        yield counts
+        fcntl.ioctl(leader, PERF_EVENT_IOC_DISABLE, 0)
+
+        # The counts are only filled in once the measured block has finished
+        counts[:] = [read_counter(fd) for fd in fds]
+    finally:
+        for fd in fds:
+            os.close(fd)
+
+
+def log_counts(cycles, instructions, num_runs):
+    logger.info(f"Cycles per Run: {cycles / num_runs:.0f}")
+    logger.info(f"Instructions per Run: {instructions / num_runs:.0f}")
+    if cycles:
+        logger.info(f"Instructions per Cycle: {instructions / cycles:.3f}")
+
+
+__all__ = ["count_events", "log_counts"]
@@ -9,6 +9,9 @@ from composit.introspection import class_name
 from mosaic.tilelab.layout import TransposedLayout
 from mosaic.tilelab.tile_view import TileLevel, TileView, ScalarTileLevel
 
+# Backends pass the alignment their kernels assume, the default is the size of a cache line
+DEFAULT_ALIGNMENT = 64
+
 
 class TileConfig(PClass):
     level_name = field()
@@ -95,10 +98,10 @@ def create_tile_config(tile_view: TileView) -> TileConfig | AtomicTileConfig:
         )
 
 
-def create_aligned_array(shape, dtype, align=32):
-    size = np.prod(shape) * np.dtype(dtype).itemsize
+def create_aligned_array(shape, dtype, align=DEFAULT_ALIGNMENT):
+    size = math.prod(shape) * np.dtype(dtype).itemsize
     buffer = np.empty(size + align, dtype=np.uint8)
-    offset = buffer.ctypes.data % align
+    offset = -buffer.ctypes.data % align
     array = np.ndarray(shape, dtype=dtype, buffer=buffer, offset=offset)
     return array
 
@@ -145,14 +148,19 @@ def compute_untilize_transpose_order(tile_config):
     return order
 
 
-def to_tilized_array(array: np.array, tile_config: TileConfig) -> np.ndarray:
-    tilized_array = create_aligned_array((math.prod(array.shape),), array.dtype)
+def to_tilized_array(array: np.array, tile_config: TileConfig, out: np.ndarray | None = None) -> np.ndarray:
+    if out is None:
+        out = create_aligned_array((math.prod(array.shape),), array.dtype)
+    elif out.ndim != 1 or out.size != array.size or not out.flags.c_contiguous:
+        # Reshaping anything else would silently copy, and the tilized values would never reach out
+        raise RuntimeError(f"out has to be a contiguous 1D array of {array.size} elements: {out.shape}")
     shape_before = compute_shape_before_tilization(tile_config)
     transpose_order = compute_tilize_transpose_order(tile_config)
     array = array.reshape(shape_before)
     array = array.transpose(transpose_order)
-    tilized_array[:] = array.flatten()
-    return tilized_array
+    # Copy straight from the transposed view to avoid materializing an intermediate flattened copy
+    out.reshape(array.shape)[...] = array
+    return out
 
 
 def from_tilized_array(array: np.array, tile_config: TileConfig) -> np.ndarray:
@@ -1,2 +1,56 @@
+import os
+import pathlib
+import shutil
+import tempfile
+
+from loguru import logger
+import pytest
+
+# pytest loads this file before any test module, and numpy and torch only read these when they load their BLAS libraries
+os.environ.setdefault("MKL_NUM_THREADS", "1")
+os.environ.setdefault("NUMEXPR_NUM_THREADS", "1")
+os.environ.setdefault("OMP_NUM_THREADS", "1")
+os.environ.setdefault("OPENBLAS_NUM_THREADS", "1")
+
+
+def pytest_addoption(parser):
+    parser.addoption("--emit-asm", action="store_true", help="Emit assembly next to every compiled kernel")
+
+
 def pytest_make_parametrize_id(config, val, argname):
-    return f"{argname}={val}"
+    parametrize_id = f"{argname}={val}"
+    if " at 0x" in parametrize_id:
+        # Memory addresses differ between pytest-xdist workers, so fall back to the default id
+        return None
+    return parametrize_id
+
+
+def pytest_configure(config):
+    if hasattr(config, "workerinput"):
+        config.build_root = pathlib.Path(config.workerinput["build_root"])
+    else:
+        # mkdtemp creates a private directory with an unpredictable name, on tmpfs if it is available
+        config.build_root = pathlib.Path(
+            tempfile.mkdtemp(prefix="composit-", dir="/dev/shm" if os.path.isdir("/dev/shm") else None)
+        )
+
+
+@pytest.hookimpl(optionalhook=True)
+def pytest_configure_node(node):
+    # Every xdist worker builds kernels under the same directory as the controller
+    node.workerinput["build_root"] = str(node.config.build_root)
+
+
+def pytest_unconfigure(config):
+    if hasattr(config, "workerinput"):
+        return
+    # Assembly and execution time plots are written next to the kernels, so keep them when they were asked for
+    if config.getoption("--emit-asm") or os.environ.get("COMPOSIT_PLOT"):
+        logger.info(f"Kept kernels, assembly and plots in {config.build_root}")
+    else:
+        shutil.rmtree(config.build_root, ignore_errors=True)
+
+
+@pytest.fixture(scope="session")
+def build_root(pytestconfig):
+    return pytestconfig.build_root
@@ -3,32 +3,154 @@ from __future__ import annotations
 
 import os
 
-os.environ["MKL_NUM_THREADS"] = "1"
-os.environ["NUMEXPR_NUM_THREADS"] = "1"
-os.environ["OMP_NUM_THREADS"] = "1"
-os.environ["OPENBLAS_NUM_THREADS "] = "1"
+# tests/conftest.py does the same for pytest runs, this only matters when the file is run directly
+os.environ.setdefault("MKL_NUM_THREADS", "1")
+os.environ.setdefault("NUMEXPR_NUM_THREADS", "1")
+os.environ.setdefault("OMP_NUM_THREADS", "1")
+os.environ.setdefault("OPENBLAS_NUM_THREADS", "1")
 
 import pytest
 
-from ctypes import cdll
+import contextlib
+from ctypes import POINTER, c_float, c_uint64
+import functools
+import gc
 import math
 import pathlib
+import sys
 import time
 
 from loguru import logger
-import matplotlib.pyplot as plt
 import numpy as np
 
 import composit as cnp
 from composit.hash import deterministic_hash
-from mosaic.backends.ctypes import cast_numpy_array_to_pointer
+from mosaic.backends.ctypes import cast_numpy_array_to_pointer, load_shared_library
 from mosaic.tilelab.layout import DefaultLayout, TransposedLayout
 from mosaic.tilelab.tile_view import TileLevel, propagate_tile_views, ScalarTileLevel
-from mosaic.tilelab.tile import create_tile_config, to_tilized_array, from_tilized_array
+from mosaic.tilelab.tile import create_tile_config, create_aligned_array, to_tilized_array, from_tilized_array
+from mosaic.backends.x86 import benchmark, perf_event
 from mosaic.backends.x86.kernels import matrix_multiplication
-from mosaic.backends.x86.compile import compile_shared_library
+from mosaic.backends.x86.compile import compile_shared_library, get_cpu_flags
+from mosaic.backends.x86.constants import MEMORY_ALIGNMENT, VectorISA
 
 FILE_DIR = pathlib.Path(__file__).parent.resolve()
+ENABLE_PLOTTING = bool(os.environ.get("COMPOSIT_PLOT"))
+ENABLE_PERF_COUNTERS = bool(os.environ.get("COMPOSIT_PERF")) and sys.platform == "linux"
+
+requires_avx512 = pytest.mark.skipif("avx512f" not in get_cpu_flags(), reason="CPU doesn't support AVX-512")
+NATIVE_VECTOR_ISA = VectorISA.AVX512 if "avx512f" in get_cpu_flags() else VectorISA.AVX2
+
+
+def b_layouts_and_vector_isas(input_a_shape, input_b_shape, l1_cache_a_shape, l1_cache_b_shape, transposed_layout):
+    # Only generate the vector ISAs that the kernel supports for the resulting tile configs
+    parameters = []
+    for l1_cache_b_layout in [DefaultLayout(), transposed_layout]:
+        for scalar_b_layout in [DefaultLayout(), transposed_layout]:
+            input_a_tile_config, input_b_tile_config, *_ = create_tile_configs(
+                input_a_shape, input_b_shape, l1_cache_a_shape, l1_cache_b_shape, l1_cache_b_layout, scalar_b_layout
+            )
+            for vector_isa in VectorISA:
+                if not matrix_multiplication.supports_vector_isa(vector_isa, input_a_tile_config, input_b_tile_config):
+                    continue
+                marks = [requires_avx512] if vector_isa == VectorISA.AVX512 else []
+                parameters.append(pytest.param(l1_cache_b_layout, scalar_b_layout, vector_isa, marks=marks))
+    return parameters
+
+
+def make_read_only(*arrays):
+    # The arrays returned by the cached functions below are shared between tests, so writing to them has to fail
+    for array in arrays:
+        array.flags.writeable = False
+    return arrays
+
+
+@functools.cache
+def create_inputs(input_a_shape, input_b_shape, seed=0):
+    random_number_generator = np.random.default_rng(seed)
+    np_input_a = random_number_generator.random(input_a_shape, dtype=np.float32) - np.float32(0.5)
+    np_input_b = random_number_generator.random(input_b_shape, dtype=np.float32) - np.float32(0.5)
+    golden_output = np_input_a @ np_input_b
+    return make_read_only(np_input_a, np_input_b, golden_output)
+
+
+@functools.cache
+def create_tile_configs(
+    input_a_shape, input_b_shape, l1_cache_a_shape, l1_cache_b_shape, l1_cache_b_layout, scalar_b_layout
+):
+    logger.info("Creating composit graph")
+    input_a_var = cnp.nn.variable(name="input_a_var", shape=input_a_shape)
+    input_b_var = cnp.nn.variable(name="input_b_var", shape=input_b_shape)
+    output_var = input_a_var @ input_b_var
+
+    logger.info("Propagate tile views and create tile metadatas")
+    tile_views = propagate_tile_views(
+        output_var.graph,
+        inputs={
+            input_a_var: [
+                TileLevel(level_name="l1_cache", tile_shape=l1_cache_a_shape),
+                ScalarTileLevel(level_name="scalar", rank=len(l1_cache_a_shape)),
+            ],
+            input_b_var: [
+                TileLevel(level_name="l1_cache", tile_shape=l1_cache_b_shape, layout=l1_cache_b_layout),
+                ScalarTileLevel(level_name="scalar", rank=len(l1_cache_b_shape), layout=scalar_b_layout),
+            ],
+        },
+    )
+    input_a_tile_config = create_tile_config(tile_views[input_a_var])
+    input_b_tile_config = create_tile_config(tile_views[input_b_var])
+    output_tile_config = create_tile_config(tile_views[output_var])
+    dtypes = (input_a_var.dtype, input_b_var.dtype, output_var.dtype)
+    return input_a_tile_config, input_b_tile_config, output_tile_config, dtypes
+
+
+@functools.cache
+def create_tilized_inputs(input_a_tile_config, input_b_tile_config):
+    np_input_a, np_input_b, _ = create_inputs(input_a_tile_config.shape, input_b_tile_config.shape)
+    input_a_flat_array = create_aligned_array((np_input_a.size,), np_input_a.dtype, align=MEMORY_ALIGNMENT)
+    input_b_flat_array = create_aligned_array((np_input_b.size,), np_input_b.dtype, align=MEMORY_ALIGNMENT)
+    to_tilized_array(np_input_a, input_a_tile_config, out=input_a_flat_array)
+    to_tilized_array(np_input_b, input_b_tile_config, out=input_b_flat_array)
+    return make_read_only(input_a_flat_array, input_b_flat_array)
+
+
+def select_benchmark_cpu(cpu_affinity):
+    # Give every xdist worker its own core so that their timed loops don't compete for the same one
+    worker = os.environ.get("PYTEST_XDIST_WORKER", "gw0")
+    worker_index = int(worker.removeprefix("gw"))
+    cpus = sorted(cpu_affinity)
+    return cpus[worker_index % len(cpus)]
+
+
+@contextlib.contextmanager
+def benchmark_environment():
+    # Pin the calling thread to a single core to avoid migrations and keep the garbage collector from pausing it
+    cpu_affinity = None
+    if hasattr(os, "sched_setaffinity"):
+        cpu_affinity = os.sched_getaffinity(0)
+        os.sched_setaffinity(0, {select_benchmark_cpu(cpu_affinity)})
+
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+        if cpu_affinity is not None:
+            os.sched_setaffinity(0, cpu_affinity)
+
+
+@contextlib.contextmanager
+def count_hardware_events():
+    counts = None
+    with contextlib.ExitStack() as stack:
+        if ENABLE_PERF_COUNTERS:
+            try:
+                counts = stack.enter_context(perf_event.count_events())
+            except OSError as error:
+                logger.warning(f"Hardware performance counters are unavailable: {error}")
+        yield counts
 
 
 def compute_gflops(input_a_shape, input_b_shape, execution_times):
@@ -42,18 +164,17 @@ def run_numpy(num_iterations, input_a_shape, input_b_shape):
         output = np_input_a @ np_input_b
         return output
 
-    execution_times = []
-    for i in range(num_iterations):
-        start = time.time_ns()
+    np_input_a, np_input_b, _ = create_inputs(input_a_shape, input_b_shape)
 
-        np_input_a = np.random.uniform(-0.5, 0.5, input_a_shape).astype(np.float32)
-        np_input_b = np.random.uniform(-0.5, 0.5, input_b_shape).astype(np.float32)
+    execution_times = np.empty(num_iterations, dtype=np.int64)
+    with benchmark_environment():
+        for i in range(num_iterations):
+            start = time.perf_counter_ns()
+            run(np_input_a, np_input_b)
+            end = time.perf_counter_ns()
+            execution_times[i] = end - start
 
-        run(np_input_a, np_input_b)
-        end = time.time_ns()
-        execution_times.append(end - start)
-
-    execution_times = np.asarray(execution_times) / 1e6
+    execution_times = execution_times / 1e6
     logger.info(f"Average Execution Time: {execution_times.mean()} milliseconds")
     logger.info(f"Minimum Execution Time: {execution_times.min()} milliseconds")
     logger.info(f"Maximum Execution Time: {execution_times.max()} milliseconds")
@@ -73,22 +194,18 @@ def run_torch(num_iterations, input_a_shape, input_b_shape):
         output = torch_a @ torch_b
         return output.numpy()
 
-    np_input_a = np.random.uniform(-0.5, 0.5, input_a_shape).astype(np.float32)
-    np_input_b = np.random.uniform(-0.5, 0.5, input_b_shape).astype(np.float32)
-    assert np.allclose(run(np_input_a, np_input_b), np_input_a @ np_input_b, atol=1e-5, rtol=1e-6)
-
-    execution_times = []
-    for i in range(num_iterations):
-        start = time.time_ns()
+    np_input_a, np_input_b, golden_output = create_inputs(input_a_shape, input_b_shape)
+    assert np.allclose(run(np_input_a, np_input_b), golden_output, atol=1e-5, rtol=1e-6)
 
-        np_input_a = np.random.uniform(-0.5, 0.5, input_a_shape).astype(np.float32)
-        np_input_b = np.random.uniform(-0.5, 0.5, input_b_shape).astype(np.float32)
-        run(np_input_a, np_input_b)
+    execution_times = np.empty(num_iterations, dtype=np.int64)
+    with benchmark_environment():
+        for i in range(num_iterations):
+            start = time.perf_counter_ns()
+            run(np_input_a, np_input_b)
+            end = time.perf_counter_ns()
+            execution_times[i] = end - start
 
-        end = time.time_ns()
-        execution_times.append(end - start)
-
-    execution_times = np.asarray(execution_times) / 1e6
+    execution_times = execution_times / 1e6
     logger.info(f"Average Execution Time: {execution_times.mean()} milliseconds")
     logger.info(f"Minimum Execution Time: {execution_times.min()} milliseconds")
     logger.info(f"Maximum Execution Time: {execution_times.max()} milliseconds")
@@ -106,22 +223,18 @@ def run_python(num_iterations, input_a_shape, input_b_shape):
                     output[m, n] += np_input_a[m, k] * np_input_b[k, n]
         return output
 
-    np_input_a = np.random.uniform(-0.5, 0.5, input_a_shape).astype(np.float32)
-    np_input_b = np.random.uniform(-0.5, 0.5, input_b_shape).astype(np.float32)
-    assert np.allclose(run(np_input_a, np_input_b), np_input_a @ np_input_b, atol=1e-5, rtol=1e-6)
-
-    execution_times = []
-    for i in range(num_iterations):
-        start = time.time_ns()
-
-        np_input_a = np.random.uniform(-0.5, 0.5, input_a_shape).astype(np.float32)
-        np_input_b = np.random.uniform(-0.5, 0.5, input_b_shape).astype(np.float32)
+    np_input_a, np_input_b, golden_output = create_inputs(input_a_shape, input_b_shape)
+    assert np.allclose(run(np_input_a, np_input_b), golden_output, atol=1e-5, rtol=1e-6)
 
-        run(np_input_a, np_input_b)
-        end = time.time_ns()
-        execution_times.append(end - start)
+    execution_times = np.empty(num_iterations, dtype=np.int64)
+    with benchmark_environment():
+        for i in range(num_iterations):
+            start = time.perf_counter_ns()
+            run(np_input_a, np_input_b)
+            end = time.perf_counter_ns()
+            execution_times[i] = end - start
 
-    execution_times = np.asarray(execution_times) / 1e6
+    execution_times = execution_times / 1e6
     logger.info(f"Average Execution Time: {execution_times.mean()} milliseconds")
     logger.info(f"Minimum Execution Time: {execution_times.min()} milliseconds")
     logger.info(f"Maximum Execution Time: {execution_times.max()} milliseconds")
@@ -138,97 +251,111 @@ def run_cnp_kernel(
     *,
     l1_cache_b_layout,
     scalar_b_layout,
-    use_avx_manually,
+    vector_isa,
     enable_profiling,
+    emit_assembly=False,
+    num_runs_per_iteration=1,
 ):
     test_output_path.mkdir(parents=True, exist_ok=True)
 
-    logger.info("Creating composit graph")
-    input_a_var = cnp.nn.variable(name="input_a_var", shape=input_a_shape)
-    input_b_var = cnp.nn.variable(name="input_b_var", shape=input_b_shape)
-    output_var = input_a_var @ input_b_var
-
-    logger.info("Propagate tile views and create tile metadatas")
-    tile_views = propagate_tile_views(
-        output_var.graph,
-        inputs={
-            input_a_var: [
-                TileLevel(level_name="l1_cache", tile_shape=l1_cache_a_shape),
-                ScalarTileLevel(level_name="scalar", rank=len(l1_cache_a_shape)),
-            ],
-            input_b_var: [
-                TileLevel(level_name="l1_cache", tile_shape=l1_cache_b_shape, layout=l1_cache_b_layout),
-                ScalarTileLevel(level_name="scalar", rank=len(l1_cache_b_shape), layout=scalar_b_layout),
-            ],
-        },
+    input_a_tile_config, input_b_tile_config, output_tile_config, dtypes = create_tile_configs(
+        input_a_shape, input_b_shape, l1_cache_a_shape, l1_cache_b_shape, l1_cache_b_layout, scalar_b_layout
     )
-    input_a_tile_config = create_tile_config(tile_views[input_a_var])
-    input_b_tile_config = create_tile_config(tile_views[input_b_var])
-    output_tile_config = create_tile_config(tile_views[output_var])
+    *input_dtypes, output_dtype = dtypes
 
     logger.info("Generate kernel")
 
     kernel_name, kernel_module = matrix_multiplication.generate_module(
         [input_a_tile_config, input_b_tile_config],
         output_tile_config,
-        [input_a_var.dtype, input_b_var.dtype],
-        output_var.dtype,
-        use_avx_manually=use_avx_manually,
+        input_dtypes,
+        output_dtype,
+        vector_isa=vector_isa,
         enable_tracy=enable_profiling,
     )
+    benchmark_name, benchmark_module = benchmark.generate_module(kernel_name, kernel_module)
     source_file_name = (test_output_path / kernel_name).with_suffix(".cpp")
-    kernel_module.save(source_file_name)
+    (kernel_module + benchmark_module).save(source_file_name)
 
     logger.info("Compile kernel as shared library")
-    shared_library_file = compile_shared_library(source_file_name, enable_tracy=enable_profiling)
+    shared_library_file = compile_shared_library(
+        source_file_name, enable_tracy=enable_profiling, emit_assembly=emit_assembly
+    )
 
     logger.info("Load kernel")
-    shared_library = cdll.LoadLibrary(shared_library_file)
+    shared_library = load_shared_library(shared_library_file)
     run_kernel = getattr(shared_library, kernel_name)
+    run_kernel.argtypes = [POINTER(c_float), POINTER(c_float), POINTER(c_float)]
+    run_kernel.restype = None
+    run_benchmark = getattr(shared_library, benchmark_name)
+    run_benchmark.argtypes = [*run_kernel.argtypes, c_uint64, c_uint64, POINTER(c_uint64)]
+    run_benchmark.restype = None
+
+    _, _, golden_output = create_inputs(input_a_shape, input_b_shape)
+    input_a_flat_array, input_b_flat_array = create_tilized_inputs(input_a_tile_config, input_b_tile_config)
+    # The kernel zero-initializes its output, so the buffer doesn't need to be cleared
+    output_flat_array = create_aligned_array(
+        (math.prod(output_tile_config.shape),), dtype=input_a_flat_array.dtype, align=MEMORY_ALIGNMENT
+    )
 
-    transpose_order = list(range(len(input_b_var.shape)))
-    transpose_order[-2:] = reversed(transpose_order[-2:])
-
-    def run(np_input_a, np_input_b):
-        input_a_flat_array = to_tilized_array(np_input_a, input_a_tile_config)
-        input_b_flat_array = to_tilized_array(np_input_b, input_b_tile_config)
-        output_flat_array = np.zeros((math.prod(output_var.shape),), dtype=input_a_flat_array.dtype)
-        run_kernel(
-            cast_numpy_array_to_pointer(input_a_flat_array),
-            cast_numpy_array_to_pointer(input_b_flat_array),
-            cast_numpy_array_to_pointer(output_flat_array),
-        )
-        return from_tilized_array(output_flat_array, output_tile_config)
+    input_a_pointer = cast_numpy_array_to_pointer(input_a_flat_array)
+    input_b_pointer = cast_numpy_array_to_pointer(input_b_flat_array)
+    output_pointer = cast_numpy_array_to_pointer(output_flat_array)
 
     logger.info("Run Comparison")
-    np_input_a = np.random.uniform(-0.5, 0.5, input_a_var.shape).astype(np.float32)
-    np_input_b = np.random.uniform(-0.5, 0.5, input_b_var.shape).astype(np.float32)
-    assert np.allclose(run(np_input_a, np_input_b), np_input_a @ np_input_b, atol=1e-5, rtol=1e-6)
-
-    logger.info(f"Run Kernel for {num_iterations} iterations")
-    execution_times = []
-    for _ in range(num_iterations):
-        start = time.time_ns()
-
-        np_input_a = np.random.uniform(-0.5, 0.5, input_a_var.shape).astype(np.float32)
-        np_input_b = np.random.uniform(-0.5, 0.5, input_b_var.shape).astype(np.float32)
-        run(np_input_a, np_input_b)
+    run_kernel(input_a_pointer, input_b_pointer, output_pointer)
+    output = from_tilized_array(output_flat_array, output_tile_config)
+    assert np.allclose(output, golden_output, atol=1e-5, rtol=1e-6)
+    verified_output_flat_array = output_flat_array.copy()
+
+    logger.info(f"Run Kernel for {num_iterations} iterations of {num_runs_per_iteration} runs")
+    execution_times = np.empty(num_iterations, dtype=np.uint64)
+    with benchmark_environment(), count_hardware_events() as counts:
+        run_benchmark(
+            input_a_pointer,
+            input_b_pointer,
+            output_pointer,
+            num_iterations,
+            num_runs_per_iteration,
+            cast_numpy_array_to_pointer(execution_times),
+        )
+    if counts is not None:
+        perf_event.log_counts(*counts, num_runs=num_iterations * num_runs_per_iteration)
 
-        end = time.time_ns()
-        execution_times.append(end - start)
+    # The kernel is deterministic, so every timed run has to reproduce the verified output exactly
+    assert np.array_equal(output_flat_array, verified_output_flat_array)
 
-    execution_times = np.asarray(execution_times) / 1e6
+    execution_times = execution_times / num_runs_per_iteration / 1e6
     logger.info(f"Average Execution Time: {execution_times.mean()} milliseconds")
     logger.info(f"Minimum Execution Time: {execution_times.min()} milliseconds")
     logger.info(f"Maximum Execution Time: {execution_times.max()} milliseconds")
     return execution_times
 
 
+def plot_execution_times(file_name, color_to_execution_times):
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    fig = Figure()
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot(111)
+    for color, execution_times in color_to_execution_times.items():
+        ax.plot(execution_times, color=color)
+
+    def center_y_axis(axes):
+        y_max = np.abs(axes.get_ylim()).max()
+        axes.set_ylim(ymin=0, ymax=y_max)
+
+    center_y_axis(ax)
+    fig.savefig(file_name)
+    logger.info(f"Saved execution times plot to {file_name}")
+
+
 def run_matrix_multiplication(
     test_output_path,
     num_iterations: int,
     compare_against_others: bool,
-    use_avx_manually: bool,
+    vector_isa: VectorISA,
     input_a_shape: tuple[int, ...],
     l1_cache_a_shape: tuple[int, ...],
     input_b_shape: tuple[int, ...],
@@ -236,6 +363,8 @@ def run_matrix_multiplication(
     l1_cache_b_layout,
     scalar_b_layout,
     enable_profiling=False,
+    emit_assembly=False,
+    num_runs_per_iteration=1,
 ):
     cnp_execution_times = run_cnp_kernel(
         num_iterations,
@@ -246,47 +375,44 @@ def run_matrix_multiplication(
         l1_cache_b_shape=l1_cache_b_shape,
         l1_cache_b_layout=l1_cache_b_layout,
         scalar_b_layout=scalar_b_layout,
-        use_avx_manually=use_avx_manually,
+        vector_isa=vector_isa,
         enable_profiling=enable_profiling,
+        emit_assembly=emit_assembly,
+        num_runs_per_iteration=num_runs_per_iteration,
     )
 
-    fig, ax = plt.subplots()
-    ax.plot(cnp_execution_times, color="green")
+    color_to_execution_times = dict(green=cnp_execution_times)
 
     if compare_against_others:
         torch_execution_times = run_torch(num_iterations, input_a_shape, input_b_shape)
         numpy_execution_times = run_numpy(num_iterations, input_a_shape, input_b_shape)
 
-        ax.plot(torch_execution_times, color="red")
-        ax.plot(numpy_execution_times, color="blue")
+        color_to_execution_times.update(red=torch_execution_times, blue=numpy_execution_times)
 
         logger.info(f"{compute_gflops(input_a_shape, input_b_shape, torch_execution_times)} GFLOPS (torch)")
         logger.info(f"{compute_gflops(input_a_shape, input_b_shape, numpy_execution_times)} GFLOPS (numpy)")
     logger.info(f"{compute_gflops(input_a_shape, input_b_shape, cnp_execution_times)} GFLOPS (composit)")
 
-    def center_y_axis(axes):
-        y_max = np.abs(axes.get_ylim()).max()
-        axes.set_ylim(ymin=0, ymax=y_max)
-
-    center_y_axis(ax)
-    fig.savefig(test_output_path / "execution_times.png")
-    fig.clf()
+    if ENABLE_PLOTTING:
+        plot_execution_times(test_output_path / "execution_times.png", color_to_execution_times)
 
 
 @pytest.mark.parametrize("num_iterations", [1000])
 @pytest.mark.parametrize("compare_against_others", [False])
-@pytest.mark.parametrize("use_avx_manually", [False, True])
 @pytest.mark.parametrize("input_a_shape", [(1, 128, 128)])
 @pytest.mark.parametrize("l1_cache_a_shape", [(1, 64, 64)])
 @pytest.mark.parametrize("input_b_shape", [(128, 128)])
 @pytest.mark.parametrize("l1_cache_b_shape", [(64, 64)])
-@pytest.mark.parametrize("l1_cache_b_layout", [DefaultLayout(), TransposedLayout(order=(1, 0))])
-@pytest.mark.parametrize("scalar_b_layout", [DefaultLayout(), TransposedLayout(order=(1, 0))])
+@pytest.mark.parametrize(
+    "l1_cache_b_layout,scalar_b_layout,vector_isa",
+    b_layouts_and_vector_isas((1, 128, 128), (128, 128), (1, 64, 64), (64, 64), TransposedLayout(order=(1, 0))),
+)
 def test_matrix_multiplication(
     request,
+    build_root,
     num_iterations,
     compare_against_others: bool,
-    use_avx_manually: bool,
+    vector_isa: VectorISA,
     input_a_shape: tuple[int, ...],
     l1_cache_a_shape: tuple[int, ...],
     input_b_shape: tuple[int, ...],
@@ -294,39 +420,42 @@ def test_matrix_multiplication(
     l1_cache_b_layout,
     scalar_b_layout,
 ):
-    np.random.seed(0)
-
     test_name = request.node.name
-    test_output_path = FILE_DIR / "test_output" / str(deterministic_hash(test_name))
+    test_output_path = build_root / str(deterministic_hash(test_name))
 
     run_matrix_multiplication(
         test_output_path,
         num_iterations,
         compare_against_others,
-        use_avx_manually,
+        vector_isa,
         input_a_shape,
         l1_cache_a_shape,
         input_b_shape,
         l1_cache_b_shape,
         l1_cache_b_layout,
         scalar_b_layout,
+        emit_assembly=request.config.getoption("--emit-asm"),
     )
 
 
 @pytest.mark.parametrize("num_iterations", [1000])
 @pytest.mark.parametrize("compare_against_others", [False])
-@pytest.mark.parametrize("use_avx_manually", [False, True])
 @pytest.mark.parametrize("input_a_shape", [(1, 4, 128, 128)])
 @pytest.mark.parametrize("l1_cache_a_shape", [(1, 1, 64, 64)])
 @pytest.mark.parametrize("input_b_shape", [(1, 4, 128, 128)])
 @pytest.mark.parametrize("l1_cache_b_shape", [(1, 1, 64, 64)])
-@pytest.mark.parametrize("l1_cache_b_layout", [DefaultLayout(), TransposedLayout(order=(0, 1, 3, 2))])
-@pytest.mark.parametrize("scalar_b_layout", [DefaultLayout(), TransposedLayout(order=(0, 1, 3, 2))])
+@pytest.mark.parametrize(
+    "l1_cache_b_layout,scalar_b_layout,vector_isa",
+    b_layouts_and_vector_isas(
+        (1, 4, 128, 128), (1, 4, 128, 128), (1, 1, 64, 64), (1, 1, 64, 64), TransposedLayout(order=(0, 1, 3, 2))
+    ),
+)
 def test_batched_matrix_multiplication(
     request,
+    build_root,
     num_iterations,
     compare_against_others: bool,
-    use_avx_manually: bool,
+    vector_isa: VectorISA,
     input_a_shape: tuple[int, ...],
     l1_cache_a_shape: tuple[int, ...],
     input_b_shape: tuple[int, ...],
@@ -334,37 +463,69 @@ def test_batched_matrix_multiplication(
     l1_cache_b_layout,
     scalar_b_layout,
 ):
-    np.random.seed(0)
-
     test_name = request.node.name
-    test_output_path = FILE_DIR / "test_output" / str(deterministic_hash(test_name))
+    test_output_path = build_root / str(deterministic_hash(test_name))
 
     run_matrix_multiplication(
         test_output_path,
         num_iterations,
         compare_against_others,
-        use_avx_manually,
+        vector_isa,
         input_a_shape,
         l1_cache_a_shape,
         input_b_shape,
         l1_cache_b_shape,
         l1_cache_b_layout,
         scalar_b_layout,
+        emit_assembly=request.config.getoption("--emit-asm"),
+    )
+
+
+@pytest.mark.parametrize("vector_isa", [VectorISA.AVX2, VectorISA.AVX512])
+def test_vector_isa_requires_transposed_b(vector_isa):
+    input_a_tile_config, input_b_tile_config, output_tile_config, dtypes = create_tile_configs(
+        (1, 128, 128), (128, 128), (1, 64, 64), (64, 64), DefaultLayout(), DefaultLayout()
     )
+    *input_dtypes, output_dtype = dtypes
+
+    with pytest.raises(RuntimeError):
+        matrix_multiplication.generate_module(
+            [input_a_tile_config, input_b_tile_config],
+            output_tile_config,
+            input_dtypes,
+            output_dtype,
+            vector_isa=vector_isa,
+        )
+
 
+@pytest.mark.parametrize("vector_isa", [VectorISA.AVX2, VectorISA.AVX512])
+def test_vector_isa_requires_k_to_be_a_multiple_of_the_vector_size(vector_isa):
+    input_a_tile_config, input_b_tile_config, output_tile_config, dtypes = create_tile_configs(
+        (1, 128, 36), (36, 128), (1, 64, 12), (12, 64), TransposedLayout(order=(1, 0)), TransposedLayout(order=(1, 0))
+    )
+    *input_dtypes, output_dtype = dtypes
+
+    assert not matrix_multiplication.supports_vector_isa(vector_isa, input_a_tile_config, input_b_tile_config)
+    with pytest.raises(RuntimeError):
+        matrix_multiplication.generate_module(
+            [input_a_tile_config, input_b_tile_config],
+            output_tile_config,
+            input_dtypes,
+            output_dtype,
+            vector_isa=vector_isa,
+        )
 
-def test_modular_benchmark(request):
-    np.random.seed(0)
 
+def test_modular_benchmark(request, build_root):
     test_name = request.node.name
-    test_output_path = FILE_DIR / "test_output" / str(deterministic_hash(test_name))
+    test_output_path = build_root / str(deterministic_hash(test_name))
 
     m_size = k_size = n_size = 512
     tile_m_size = tile_k_size = tile_n_size = 64
     python_m_size = python_k_size = python_n_size = 128
 
     num_iterations = 2
-    use_avx_manually = True
+    vector_isa = NATIVE_VECTOR_ISA
     input_a_shape = (m_size, k_size)
     l1_cache_a_shape = (tile_m_size, tile_k_size)
     input_b_shape = (k_size, n_size)
@@ -382,8 +543,9 @@ def test_modular_benchmark(request):
         l1_cache_b_shape=l1_cache_b_shape,
         l1_cache_b_layout=l1_cache_b_layout,
         scalar_b_layout=scalar_b_layout,
-        use_avx_manually=use_avx_manually,
+        vector_isa=vector_isa,
         enable_profiling=enable_profiling,
+        emit_assembly=request.config.getoption("--emit-asm"),
     )
 
     numpy_execution_times = run_numpy(num_iterations, input_a_shape, input_b_shape)
@@ -420,7 +582,7 @@ if __name__ == "__main__":
         FILE_DIR / "test_output" / "custom",
         num_iterations=25,
         compare_against_others=True,
-        use_avx_manually=True,
+        vector_isa=NATIVE_VECTOR_ISA,
         input_a_shape=(batch_size, sequence_size, m_size, k_size),
         l1_cache_a_shape=(batch_size, sequence_size, tile_m_size, tile_k_size),
         input_b_shape=(batch_size, sequence_size, k_size, n_size),
@@ -428,4 +590,5 @@ if __name__ == "__main__":
         l1_cache_b_layout=TransposedLayout(order=(0, 1, 3, 2)),
         scalar_b_layout=TransposedLayout(order=(0, 1, 3, 2)),
         enable_profiling=False,
+        num_runs_per_iteration=10,
     )
@@ -0,0 +1,29 @@
+import pytest
+
+import contextlib
+
+from mosaic.backends.x86 import perf_event
+
+
+@pytest.mark.parametrize(
+    "events",
+    [
+        ((perf_event.PERF_TYPE_SOFTWARE, perf_event.PERF_COUNT_SW_TASK_CLOCK),),
+        perf_event.HARDWARE_EVENTS,
+    ],
+)
+def test_count_events(events):
+    def count(work_size):
+        with contextlib.ExitStack() as stack:
+            try:
+                counts = stack.enter_context(perf_event.count_events(events))
+            except OSError as error:
+                pytest.skip(f"perf_event_open is unavailable: {error}")
+            sum(range(work_size))
+        return counts
+
+    small_counts = count(10_000)
+    large_counts = count(1_000_000)
+
+    assert len(small_counts) == len(large_counts) == len(events)
+    assert all(0 < small_count < large_count for small_count, large_count in zip(small_counts, large_counts))
@@ -10,7 +10,7 @@ from mosaic.tilelab.tile_view import (
     propagate_tile_views,
 )
 
-from mosaic.tilelab.tile import to_tilized_array, from_tilized_array, create_tile_config
+from mosaic.tilelab.tile import to_tilized_array, from_tilized_array, create_tile_config, create_aligned_array
 
 
 @pytest.mark.parametrize("input_shape", [(4, 32, 32)])
@@ -199,3 +199,58 @@ def test_matmul_add_subtract_sum(input_0_shape, input_1_shape):
 
     output_flat_array = to_tilized_array(output, output_tile_config)
     assert np.allclose(output, from_tilized_array(output_flat_array, output_tile_config))
+
+
+@pytest.mark.parametrize("input_shape", [(4, 32, 32)])
+def test_to_tilized_array_out(input_shape):
+    np_input = np.random.uniform(-0.5, 0.5, input_shape)
+
+    view = create_tile_view(
+        np_input.shape,
+        [
+            TileLevel(level_name="buffer", tile_shape=(1, 16, 8)),
+            TileLevel(level_name="block", tile_shape=(1, 8, 4)),
+            TileLevel(level_name="tile", tile_shape=(1, 4, 4)),
+        ],
+    )
+    tile_config = create_tile_config(view)
+
+    out = create_aligned_array((np_input.size,), np_input.dtype)
+    tilized_array = to_tilized_array(np_input, tile_config, out=out)
+
+    assert tilized_array is out
+    assert np.array_equal(tilized_array, to_tilized_array(np_input, tile_config))
+    assert np.array_equal(np_input, from_tilized_array(tilized_array, tile_config))
+
+
+def test_to_tilized_array_invalid_out():
+    np_input = np.random.uniform(-0.5, 0.5, (1, 16, 8))
+    tile_config = create_tile_config(
+        create_tile_view(
+            np_input.shape,
+            [
+                TileLevel(level_name="buffer", tile_shape=(1, 8, 4)),
+                TileLevel(level_name="tile", tile_shape=(1, 4, 4)),
+            ],
+        )
+    )
+
+    for out in [
+        np.empty(np_input.shape, np_input.dtype),
+        np.empty(np_input.size + 1, np_input.dtype),
+        np.empty(np_input.size * 2, np_input.dtype)[::2],
+    ]:
+        with pytest.raises(RuntimeError):
+            to_tilized_array(np_input, tile_config, out=out)
+
+
+@pytest.mark.parametrize("shape", [(1,), (3, 5), (128, 128)])
+@pytest.mark.parametrize("dtype", [np.float32, np.int64])
+@pytest.mark.parametrize("align", [32, 64])
+def test_create_aligned_array(shape, dtype, align):
+    # Allocate repeatedly so that the underlying buffers start at different offsets
+    for _ in range(16):
+        array = create_aligned_array(shape, dtype, align=align)
+        assert array.shape == shape
+        assert array.dtype == dtype
+        assert array.ctypes.data % align == 0